@@ -2,10 +2,19 @@ import os
 import json
 import requests
 import datetime
-from typing import Dict, Any, Optional, List, Union
-from fastapi import APIRouter, HTTPException, Depends
+import hashlib
+import asyncio
+import time
+from typing import Callable, Dict, Any, Optional, List, Set, Tuple, Union
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from idempotency import IdempotencyStore, IdempotencyConflict
+from resilience import CircuitBreaker, CircuitOpenError
+from json_view import JsonFileView
+from profiling import profile_span
+from extractors import extract_answers, has_fast_path, is_valid_question
 
 # Load environment variables
 load_dotenv()
@@ -14,9 +23,45 @@ load_dotenv()
 BLAND_API_KEY = os.getenv("BLAND_API_KEY")
 BLAND_API_BASE_URL = "https://api.bland.ai/v1"
 
+# Retried POST /bland/calls requests with the same Idempotency-Key get the original response
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("BLAND_IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("BLAND_IDEMPOTENCY_MAX_KEYS", 1000))
+# Calls to the same number within this window reuse the original call (0 disables)
+DUPLICATE_NUMBER_WINDOW_SECONDS = float(os.getenv("BLAND_DUPLICATE_NUMBER_WINDOW_SECONDS", 0))
+
+idempotency_store = IdempotencyStore(max_entries=IDEMPOTENCY_MAX_KEYS, ttl_seconds=IDEMPOTENCY_TTL_SECONDS)
+recent_numbers_store = IdempotencyStore(max_entries=IDEMPOTENCY_MAX_KEYS, ttl_seconds=DUPLICATE_NUMBER_WINDOW_SECONDS)
+
+BLAND_API_TIMEOUT_SECONDS = float(os.getenv("BLAND_API_TIMEOUT_SECONDS", 30))
+
+def _is_bland_failure(e: Exception) -> bool:
+    # Client errors mean Bland is healthy, only outages and overload should trip the breaker
+    if not isinstance(e, requests.exceptions.RequestException):
+        return False
+    response = getattr(e, "response", None)
+    return response is None or response.status_code >= 500 or response.status_code == 429
+
+bland_breaker = CircuitBreaker(
+    "Bland AI",
+    failure_threshold=int(os.getenv("BLAND_BREAKER_FAILURE_THRESHOLD", 5)),
+    slow_call_seconds=float(os.getenv("BLAND_BREAKER_SLOW_CALL_SECONDS", 20)),
+    recovery_timeout=float(os.getenv("BLAND_BREAKER_RECOVERY_SECONDS", 30)),
+    is_failure=_is_bland_failure,
+)
+
 # Create router
 router = APIRouter(prefix="/bland", tags=["bland"])
 
+# Waiters for each call, woken up by the completion webhook; several jobs may wait on one call
+call_completions: Dict[str, Set[asyncio.Event]] = {}
+# Statuses of calls that ended without a conversation to analyze
+FAILED_CALL_STATUSES = {"failed", "canceled", "cancelled", "no-answer", "busy", "stopped"}
+FINISHED_CALL_STATUSES = FAILED_CALL_STATUSES | {"completed"}
+
+# In-memory views of the local call files, so polling does not re-read and re-send unchanged data
+call_data_view = JsonFileView(os.path.join(os.path.dirname(__file__), "call_data.json"))
+call_analysis_view = JsonFileView(os.path.join(os.path.dirname(__file__), "call_analysis.json"))
+
 # Pydantic models for request validation
 class BlandAICallRequest(BaseModel):
     phone_number: str = Field(..., description="The phone number to call in E.164 format (e.g., +12223334444)")
@@ -57,6 +102,8 @@ def call_bland_api(endpoint: str, method: str = "GET", data: Dict[str, Any] = No
 
     Returns:
         API response as dictionary
+
+    Raises CircuitOpenError without calling Bland AI while the breaker is open
     """
     if not BLAND_API_KEY:
         raise HTTPException(status_code=500, detail="BLAND_API_KEY not configured")
@@ -64,18 +111,22 @@ def call_bland_api(endpoint: str, method: str = "GET", data: Dict[str, Any] = No
     url = f"{BLAND_API_BASE_URL}/{endpoint.lstrip('/')}"
     headers = {"Authorization": BLAND_API_KEY}
 
-    try:
+    def send() -> requests.Response:
         if method.upper() == "GET":
-            response = requests.get(url, headers=headers)
+            response = requests.get(url, headers=headers, timeout=BLAND_API_TIMEOUT_SECONDS)
         elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=data)
+            response = requests.post(url, headers=headers, json=data, timeout=BLAND_API_TIMEOUT_SECONDS)
         elif method.upper() == "DELETE":
-            response = requests.delete(url, headers=headers)
+            response = requests.delete(url, headers=headers, timeout=BLAND_API_TIMEOUT_SECONDS)
         else:
             raise ValueError(f"Unsupported HTTP method: {method}")
 
         response.raise_for_status()
-        return response.json()
+        return response
+
+    try:
+        with profile_span(f"bland.{method.upper()}"):
+            return bland_breaker.call(send).json()
     except requests.exceptions.RequestException as e:
         if hasattr(e, 'response') and e.response is not None:
             try:
@@ -160,10 +211,117 @@ def save_call_analysis(analysis_response: Dict[str, Any], call_id: str) -> None:
     with open(file_path, "w") as f:
         json.dump(existing_data, f, indent=2)
 
+class DuplicateCallConflict(Exception):
+    """Raised when a number was recently called with a different request"""
+
+def call_fingerprint(call_data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(call_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+async def place_call(call_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Dial a call through Bland AI and record it in call_data.json
+
+    Raises HTTPException if Bland AI rejects the call
+    """
+    # Run the blocking request off the event loop so duplicate requests can wait on it
+    try:
+        api_response = await run_in_threadpool(call_bland_api, "calls", "POST", call_data)
+    except HTTPException as e:
+        # Saved here rather than by the caller, so requests waiting on this one do not save it again
+        save_call_data({"status": "error", "error": e.detail}, call_data)
+        raise
+    call_response = {"status": "success", "call_id": api_response.get("call_id")}
+
+    # Save call data to JSON file
+    save_call_data(call_response, call_data)
+    return call_response
+
+async def place_call_once_per_number(call_data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Dial a call, reusing a call to the same number within the duplicate window
+
+    Returns:
+        Tuple of (call response, replayed)
+
+    Raises DuplicateCallConflict if the number was called within the window
+    with a different request
+    """
+    if DUPLICATE_NUMBER_WINDOW_SECONDS <= 0:
+        return await place_call(call_data), False
+    try:
+        return await recent_numbers_store.run(
+            call_data["phone_number"], call_fingerprint(call_data), lambda: place_call(call_data)
+        )
+    except IdempotencyConflict:
+        raise DuplicateCallConflict(
+            f"{call_data['phone_number']} was called with a different request "
+            f"in the last {DUPLICATE_NUMBER_WINDOW_SECONDS:g} seconds"
+        )
+
+def is_call_finished(details: Dict[str, Any]) -> bool:
+    return bool(details.get("completed")) or details.get("status") in FINISHED_CALL_STATUSES
+
+async def wait_for_call_completion(call_id: str, timeout: float, poll_interval: float = 10.0) -> Dict[str, Any]:
+    """
+    Wait until a call has finished and return its details
+
+    Checks again as soon as the completion webhook is hit, and polls the
+    call in between in case the webhook is not configured. The details
+    always come from Bland AI, never from the webhook body.
+
+    Raises asyncio.TimeoutError if the call has not finished within timeout
+    """
+    woken = asyncio.Event()
+    call_completions.setdefault(call_id, set()).add(woken)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                details = await run_in_threadpool(call_bland_api, f"calls/{call_id}")
+                if is_call_finished(details):
+                    return details
+            except (HTTPException, CircuitOpenError):
+                # Keep waiting through transient lookup errors until the deadline
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"Call {call_id} did not finish within {timeout} seconds")
+            try:
+                await asyncio.wait_for(woken.wait(), timeout=min(poll_interval, remaining))
+                woken.clear()
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        waiters = call_completions.get(call_id)
+        if waiters is not None:
+            waiters.discard(woken)
+            if not waiters:
+                del call_completions[call_id]
+
+@router.post("/calls/webhook")
+async def call_completed_webhook(payload: Dict[str, Any]):
+    """
+    Receive call completion events from Bland AI
+
+    The webhook is unauthenticated, so the body is only used to wake up
+    anything waiting on the call, which then fetches the call from Bland AI
+    """
+    for woken in call_completions.get(payload.get("call_id"), ()):
+        woken.set()
+    return {"status": "success"}
+
 @router.post("/calls", response_model=BlandAICallResponse)
-async def send_call(request: BlandAICallRequest):
+async def send_call(
+    request: BlandAICallRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     """
     Send a call using Bland AI
+
+    Requests carrying an Idempotency-Key header are only dialed once; retries
+    get the original response and retries of an in-flight request wait for it.
     """
     # Validate that either task or pathway_id is provided
     if not request.task and not request.pathway_id:
@@ -176,22 +334,93 @@ async def send_call(request: BlandAICallRequest):
     if "from_number" in call_data:
         call_data["from"] = call_data.pop("from_number")
 
+    async def dial_once_per_number() -> Dict[str, Any]:
+        call_response, replayed = await place_call_once_per_number(call_data)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return call_response
+
     # Make API call to Bland AI
     try:
-        response = call_bland_api("calls", method="POST", data=call_data)
-        call_response = {"status": "success", "call_id": response.get("call_id")}
-
-        # Save call data to JSON file
-        save_call_data(call_response, call_data)
+        if idempotency_key:
+            call_response, replayed = await idempotency_store.run(idempotency_key, call_fingerprint(call_data), dial_once_per_number)
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            call_response = await dial_once_per_number()
 
         return BlandAICallResponse(**call_response)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DuplicateCallConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except HTTPException as e:
+        # The failed call was already saved to call_data.json by place_call
         error_response = {"status": "error", "error": e.detail}
+        return BlandAICallResponse(**error_response)
 
-        # Save failed call data to JSON file
-        save_call_data(error_response, call_data)
+def view_response(request: Request, view: JsonFileView, variant: str, build: Callable[[], Dict[str, Any]]) -> Response:
+    """
+    Serve a payload built from a view, honouring If-None-Match
 
-        return BlandAICallResponse(**error_response)
+    The serialized payload is cached per variant until the view changes.
+    """
+    headers = {"ETag": view.etag, "X-Sync-Cursor": view.cursor, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or view.etag in [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    payload = view.get_payload(variant)
+    if payload is None:
+        with profile_span("serialize"):
+            payload = json.dumps(build()).encode("utf-8")
+        view.set_payload(variant, payload)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+# Registered before /calls/{call_id} so "analysis" is not taken as a call ID
+@router.get("/calls")
+async def get_all_calls(request: Request, since: Optional[str] = None):
+    """
+    Get all call data from the local JSON file
+
+    Pass the X-Sync-Cursor of a previous response as ?since= to only get calls
+    created or modified after it
+    """
+    call_data_view.refresh()
+
+    def build() -> Dict[str, Any]:
+        if call_data_view.status == JsonFileView.MISSING:
+            return {"calls": {}, "count": 0, "message": "No call data available"}
+        if call_data_view.status == JsonFileView.INVALID:
+            return {"calls": {}, "count": 0, "error": "Error reading call data file"}
+        if since is None:
+            return {"calls": call_data_view.records, "count": len(call_data_view.records)}
+        calls, deleted, full_sync = call_data_view.changes_since(since)
+        return {"calls": calls, "count": len(calls), "deleted": deleted, "full_sync": full_sync, "cursor": call_data_view.cursor}
+
+    return view_response(request, call_data_view, since or "", build)
+
+@router.get("/calls/analysis")
+async def get_call_analysis(request: Request, since: Optional[str] = None):
+    """
+    Get the most recent call analysis data from the call_analysis.json file
+
+    Pass the X-Sync-Cursor of a previous response as ?since= to only get
+    analyses created or modified after it
+    """
+    call_analysis_view.refresh()
+
+    def build() -> Dict[str, Any]:
+        if call_analysis_view.status == JsonFileView.MISSING:
+            return {"status": "error", "message": "No call analysis data available"}
+        if call_analysis_view.status == JsonFileView.INVALID:
+            return {"status": "error", "error": "Error reading call analysis file"}
+        if since is None:
+            return call_analysis_view.records
+        analyses, deleted, full_sync = call_analysis_view.changes_since(since)
+        return {"analyses": analyses, "count": len(analyses), "deleted": deleted, "full_sync": full_sync, "cursor": call_analysis_view.cursor}
+
+    return view_response(request, call_analysis_view, since or "", build)
 
 @router.get("/calls/{call_id}")
 async def get_call_details(call_id: str):
@@ -210,14 +439,14 @@ async def get_call_details(call_id: str):
                     # Return combined data from our local storage
                     return {
                         "local_data": call_data[call_id],
-                        "api_data": call_bland_api(f"calls/{call_id}")
+                        "api_data": await run_in_threadpool(call_bland_api, f"calls/{call_id}")
                     }
         except (json.JSONDecodeError, FileNotFoundError):
             # If there's an issue with the file, continue to API call
             pass
 
     # If we don't have local data, just return the API data
-    return call_bland_api(f"calls/{call_id}")
+    return await run_in_threadpool(call_bland_api, f"calls/{call_id}")
 
 @router.post("/calls/{call_id}/stop")
 async def stop_call(call_id: str):
@@ -225,7 +454,7 @@ async def stop_call(call_id: str):
     Stop an active call and update local call data
     """
     # Call the Bland AI API to stop the call
-    response = call_bland_api(f"calls/{call_id}/stop", method="POST")
+    response = await run_in_threadpool(call_bland_api, f"calls/{call_id}/stop", method="POST")
 
     # Update our local call data to reflect that the call was stopped
     file_path = os.path.join(os.path.dirname(__file__), "call_data.json")
@@ -248,38 +477,6 @@ async def stop_call(call_id: str):
 
     return response
 
-@router.get("/calls")
-async def get_all_calls():
-    """
-    Get all call data from the local JSON file
-    """
-    file_path = os.path.join(os.path.dirname(__file__), "call_data.json")
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-        try:
-            with open(file_path, "r") as f:
-                call_data = json.load(f)
-            return {"calls": call_data, "count": len(call_data)}
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"calls": {}, "count": 0, "error": "Error reading call data file"}
-    else:
-        return {"calls": {}, "count": 0, "message": "No call data available"}
-
-@router.get("/calls/analysis")
-async def get_call_analysis():
-    """
-    Get the most recent call analysis data from the call_analysis.json file
-    """
-    file_path = os.path.join(os.path.dirname(__file__), "call_analysis.json")
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-        try:
-            with open(file_path, "r") as f:
-                analysis_data = json.load(f)
-            return analysis_data
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"status": "error", "error": "Error reading call analysis file"}
-    else:
-        return {"status": "error", "message": "No call analysis data available"}
-
 @router.get("/calls/{call_id}/analysis")
 async def get_call_analysis_by_id(call_id: str):
     """
@@ -307,11 +504,65 @@ async def get_call_analysis_by_id(call_id: str):
     else:
         return {"status": "error", "message": "No call analysis data available"}
 
+async def analyze_with_fast_path(call_id: str, analyze_data: Dict[str, Any], details: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Answer a call's analysis questions, only sending Bland AI the ones that
+    cannot be extracted locally from the transcript
+
+    Pass the call details if they are already known to skip fetching them.
+    Returns a response shaped like Bland AI's analyze response, plus a
+    provenance entry per answer
+    """
+    questions = analyze_data["questions"]
+    extractions = [None] * len(questions)
+    # Only fetch the transcript if some question could be answered locally
+    if has_fast_path(questions):
+        try:
+            if details is None:
+                details = await run_in_threadpool(call_bland_api, f"calls/{call_id}")
+            transcript = details.get("concatenated_transcript") or ""
+            with profile_span("extract"):
+                extractions = extract_answers(transcript, questions)
+        except HTTPException:
+            # Without a transcript every question goes to Bland AI
+            pass
+
+    remaining = [i for i, extraction in enumerate(extractions) if extraction is None]
+    response = {"status": "success", "message": "Answered from transcript", "questions": questions}
+    bland_answers = []
+    if remaining:
+        response = await run_in_threadpool(
+            call_bland_api,
+            f"calls/{call_id}/analyze",
+            method="POST",
+            data={"goal": analyze_data["goal"], "questions": [questions[i] for i in remaining]},
+        )
+        response = dict(response, questions=questions)
+        bland_answers = response.get("answers") or []
+
+    answers, provenance = [], []
+    for i, extraction in enumerate(extractions):
+        if extraction is not None:
+            answers.append(extraction.value)
+            provenance.append(extraction.provenance())
+        else:
+            position = remaining.index(i)
+            answers.append(bland_answers[position] if position < len(bland_answers) else None)
+            provenance.append({"source": "bland"})
+    response["answers"] = answers
+    response["provenance"] = provenance
+    return response
+
 @router.post("/calls/analyze")
 async def analyze_call(request: BlandAIAnalyzeRequest):
     """
     Analyze the most recent call using Bland AI's analyze API
+
+    Questions that can be answered from the transcript locally are not sent to Bland AI
     """
+    if not all(is_valid_question(entry) for entry in request.questions):
+        raise HTTPException(status_code=400, detail="Each question must be a [question, answer_type] pair")
+
     # Get the most recent call from the JSON file
     file_path = os.path.join(os.path.dirname(__file__), "call_data.json")
     if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
@@ -350,7 +601,7 @@ async def analyze_call(request: BlandAIAnalyzeRequest):
 
         # Make API call to Bland AI analyze endpoint
         try:
-            response = call_bland_api(f"calls/{most_recent_call_id}/analyze", method="POST", data=analyze_data)
+            response = await analyze_with_fast_path(most_recent_call_id, analyze_data)
 
             # Update the call data with analysis results
             call_data[most_recent_call_id]["analysis"] = {
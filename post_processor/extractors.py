@@ -0,0 +1,306 @@
+import os
+import re
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Answers below this confidence are left for the LLM
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", 0.8))
+
+SPEAKER_PATTERN = re.compile(r"(?im)^\s*(user|human|caller|customer|assistant|agent|ai)\s*:")
+USER_SPEAKERS = {"user", "human", "caller", "customer"}
+
+STOPWORDS = {
+    "what", "which", "when", "where", "would", "could", "should", "does", "their", "there",
+    "they", "them", "this", "that", "with", "from", "have", "your", "about", "participant",
+    "please", "how", "the", "and", "for", "you", "are", "did", "was", "were",
+}
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+NUMBER_PATTERN = re.compile(r"\b(\d+(?:\.\d+)?|" + "|".join(NUMBER_WORDS) + r")\b", re.IGNORECASE)
+SCALE_PATTERN = re.compile(r"scale of (\d+)\s*(?:-|to)\s*(\d+)|out of (\d+)", re.IGNORECASE)
+OUT_OF_PATTERN = re.compile(r"\b(?:out of|/)\s*(\d+|ten)\b", re.IGNORECASE)
+
+YES_PATTERN = re.compile(r"\b(yes|yeah|yep|yup|sure|correct|absolutely|definitely|of course)\b", re.IGNORECASE)
+NO_PATTERN = re.compile(r"\b(no|nope|nah|never)\b", re.IGNORECASE)
+# Idioms that mean yes despite containing "no", "never" or "not", rewritten before anything else
+YES_PHRASE_PATTERN = re.compile(
+    r"\b(?:no (?:problem|worries|doubt|question)|never (?:been )?better|why not)\b",
+    re.IGNORECASE,
+)
+# Negated phrases that clearly mean no, rewritten before looking for other negations
+NO_PHRASE_PATTERN = re.compile(
+    r"\b(?:(?:absolutely|definitely|certainly|of course|sure) not|not really|not at all|do ?n['’]t think so)\b",
+    re.IGNORECASE,
+)
+# Any other negation ("yes, I don't mind") is left for the LLM
+NEGATION_PATTERN = re.compile(r"\bnot\b|n['’]t\b", re.IGNORECASE)
+
+CURRENCY_SYMBOLS = {"£": "£", "$": "$", "€": "€", "pound": "£", "quid": "£", "dollar": "$", "buck": "$", "euro": "€"}
+PRICE_PATTERN = re.compile(
+    r"([£$€])\s?(\d[\d,]*(?:\.\d{1,2})?)|(\d[\d,]*(?:\.\d{1,2})?)\s*(pound|quid|dollar|buck|euro)s?\b",
+    re.IGNORECASE,
+)
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+# Full month names and standard abbreviations only, so "marketing" or "decent" are not months
+MONTH_PATTERN = (
+    r"(january|february|march|april|may|june|july|august|september|october|november|december"
+    r"|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec)\b\.?"
+)
+DATE_PATTERNS = [
+    re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b"),
+    re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_PATTERN + r"(?:,?\s+(\d{4}))?\b", re.IGNORECASE),
+    re.compile(r"\b" + MONTH_PATTERN + r"\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b", re.IGNORECASE),
+]
+
+PRICE_QUESTION = re.compile(r"\b(price|cost|how much|fee|charge|rate per)\b", re.IGNORECASE)
+DATE_QUESTION = re.compile(r"\b(date|when|what day)\b", re.IGNORECASE)
+
+
+class Extraction:
+    """An answer pulled from a transcript without calling an LLM"""
+
+    def __init__(self, value: Any, confidence: float, source: str):
+        self.value = value
+        self.confidence = confidence
+        self.source = source
+
+    def provenance(self) -> Dict[str, Any]:
+        return {"source": self.source, "confidence": self.confidence}
+
+
+class FastPathStats:
+    """Counts how often each kind of question is answered without the LLM"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(kind, {"attempts": 0, "hits": 0})
+            counts["attempts"] += 1
+            counts["hits"] += int(hit)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            by_kind = {k: dict(c, hit_rate=round(c["hits"] / c["attempts"], 3)) for k, c in self._counts.items()}
+        attempts = sum(c["attempts"] for c in by_kind.values())
+        hits = sum(c["hits"] for c in by_kind.values())
+        return {
+            "attempts": attempts,
+            "hits": hits,
+            "hit_rate": round(hits / attempts, 3) if attempts else 0.0,
+            "by_kind": by_kind,
+        }
+
+
+fast_path_stats = FastPathStats()
+
+
+def split_turns(transcript: str) -> List[Tuple[str, str]]:
+    """Split a "user: ... assistant: ..." transcript into (speaker, text) turns"""
+    matches = list(SPEAKER_PATTERN.finditer(transcript))
+    turns = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(transcript)
+        speaker = "user" if match.group(1).lower() in USER_SPEAKERS else "agent"
+        turns.append((speaker, transcript[match.end():end].strip()))
+    return turns
+
+
+def _keywords(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def find_answer_span(turns: List[Tuple[str, str]], question: str) -> Optional[Tuple[str, float]]:
+    """
+    Find what the user said in reply to the agent asking the question
+
+    Picks the agent turn sharing the most keywords with the question and
+    returns the user turns that follow it together with the share of the
+    question's keywords the agent turn contained, or None if no turn is close
+    enough.
+    """
+    keywords = _keywords(question)
+    if not keywords:
+        return None
+
+    best_index, best_score = None, 0.0
+    for i, (speaker, text) in enumerate(turns):
+        if speaker != "agent":
+            continue
+        score = len(keywords & _keywords(text)) / len(keywords)
+        if score > best_score:
+            best_index, best_score = i, score
+    if best_index is None or best_score < 0.5:
+        return None
+
+    reply = []
+    for speaker, text in turns[best_index + 1:]:
+        if speaker != "user":
+            break
+        reply.append(text)
+    if not reply:
+        return None
+    return " ".join(reply), best_score
+
+
+def _to_number(token: str) -> float:
+    token = token.lower()
+    return float(NUMBER_WORDS[token]) if token in NUMBER_WORDS else float(token)
+
+
+def extract_number(answer: str, question: str) -> Optional[Extraction]:
+    scale = SCALE_PATTERN.search(question)
+    low, high = None, None
+    if scale:
+        if scale.group(3):
+            low, high = 0.0, float(scale.group(3))
+        else:
+            low, high = float(scale.group(1)), float(scale.group(2))
+        # "8 out of 10" should not count 10 as a second rating
+        answer = OUT_OF_PATTERN.sub("", answer)
+
+    candidates = {_to_number(m.group(1)) for m in NUMBER_PATTERN.finditer(answer)}
+    if low is not None:
+        candidates = {n for n in candidates if low <= n <= high}
+    if len(candidates) != 1:
+        return None
+
+    value = candidates.pop()
+    value = int(value) if value.is_integer() else value
+    # A number inside the question's scale is much more likely to be the answer than any number
+    return Extraction(value, 0.95 if scale else 0.85, "rule:rating" if scale else "rule:number")
+
+
+def extract_boolean(answer: str, question: str) -> Optional[Extraction]:
+    answer = YES_PHRASE_PATTERN.sub(" yes ", answer)
+    answer = NO_PHRASE_PATTERN.sub(" no ", answer)
+    if NEGATION_PATTERN.search(answer):
+        return None
+    said_yes = YES_PATTERN.search(answer) is not None
+    said_no = NO_PATTERN.search(answer) is not None
+    if said_yes == said_no:
+        return None
+    # The more the caller says besides yes or no, the more likely it qualifies the answer
+    words = len(re.findall(r"[a-z']+", answer, re.IGNORECASE))
+    return Extraction(said_yes, 0.95 if words <= 4 else 0.85, "rule:yes_no")
+
+
+def extract_price(answer: str, question: str) -> Optional[Extraction]:
+    prices = set()
+    for m in PRICE_PATTERN.finditer(answer):
+        if m.group(1):
+            symbol, amount = m.group(1), m.group(2)
+        else:
+            symbol, amount = CURRENCY_SYMBOLS[m.group(4).lower()], m.group(3)
+        prices.add(f"{symbol}{amount.replace(',', '')}")
+    if len(prices) != 1:
+        return None
+    # Other numbers in the reply may be a different price that was not recognised
+    other_numbers = len(NUMBER_PATTERN.findall(PRICE_PATTERN.sub("", answer)))
+    return Extraction(prices.pop(), 0.85 if other_numbers else 0.95, "rule:price")
+
+
+def _month_number(name: str) -> int:
+    return next(i for i, month in enumerate(MONTHS, 1) if month.startswith(name.lower()[:3]))
+
+
+def extract_date(answer: str, question: str) -> Optional[Extraction]:
+    dates = set()
+    for pattern_index, pattern in enumerate(DATE_PATTERNS):
+        for m in pattern.finditer(answer):
+            if pattern_index == 0:
+                year, month, day = int(m.group(1)), int(m.group(2)), int(m.group(3))
+            elif pattern_index == 1:
+                day, month, year = int(m.group(1)), _month_number(m.group(2)), m.group(3)
+            else:
+                month, day, year = _month_number(m.group(1)), int(m.group(2)), m.group(3)
+            try:
+                # Without a year only the month and day are known
+                dates.add(date(int(year), month, day).isoformat() if year else f"--{month:02d}-{day:02d}")
+            except ValueError:
+                continue
+    if len(dates) != 1:
+        return None
+    value = dates.pop()
+    # A date without a year may not be the one the question is about
+    return Extraction(value, 0.85 if value.startswith("--") else 0.95, "rule:date")
+
+
+def is_valid_question(entry: Any) -> bool:
+    """Check an entry is a [question] or [question, answer_type] pair of strings"""
+    return (
+        isinstance(entry, (list, tuple))
+        and 1 <= len(entry) <= 2
+        and all(isinstance(part, str) for part in entry)
+        and bool(entry[0].strip())
+    )
+
+
+def _extractor_for(question: str, answer_type: str):
+    answer_type = answer_type.lower()
+    if answer_type in ("number", "integer", "float"):
+        return extract_number
+    if answer_type in ("boolean", "bool", "yes/no"):
+        return extract_boolean
+    if answer_type in ("price", "currency", "money") or (answer_type == "string" and PRICE_QUESTION.search(question)):
+        return extract_price
+    if answer_type == "date" or (answer_type == "string" and DATE_QUESTION.search(question)):
+        return extract_date
+    return None
+
+
+def has_fast_path(questions: List[List[str]]) -> bool:
+    """Check whether any question could be answered locally, before fetching a transcript"""
+    return any(
+        is_valid_question(entry) and _extractor_for(entry[0], entry[1] if len(entry) > 1 else "string")
+        for entry in questions
+    )
+
+
+def extract_answers(transcript: str, questions: List[List[str]]) -> List[Optional[Extraction]]:
+    """
+    Try to answer typed questions from a transcript without an LLM
+
+    Args:
+        transcript: Call transcript with "user:" / "assistant:" speaker labels
+        questions: [question, answer_type] pairs as used by Bland AI analyze
+
+    Returns:
+        One entry per question, None where the answer should come from the LLM
+    """
+    turns = split_turns(transcript)
+    results = []
+    for entry in questions:
+        if not is_valid_question(entry):
+            results.append(None)
+            continue
+        question = entry[0]
+        answer_type = entry[1] if len(entry) > 1 else "string"
+        extractor = _extractor_for(question, answer_type)
+        if extractor is None:
+            fast_path_stats.record("unsupported", False)
+            results.append(None)
+            continue
+
+        span = find_answer_span(turns, question)
+        extraction = extractor(span[0], question) if span else None
+        if extraction is not None:
+            # Trust the answer less when the agent asked something only loosely like the question
+            extraction.confidence = round(extraction.confidence * (0.75 + 0.25 * span[1]), 3)
+            if extraction.confidence < FAST_PATH_MIN_CONFIDENCE:
+                extraction = None
+        fast_path_stats.record(extractor.__name__[len("extract_"):], extraction is not None)
+        results.append(extraction)
+    return results
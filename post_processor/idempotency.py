@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused with a different request body"""
+
+
+class _Entry:
+    def __init__(self, fingerprint: Optional[str]):
+        self.fingerprint = fingerprint
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.expires_at: Optional[float] = None
+
+
+class IdempotencyStore:
+    """
+    Bounded store of recent request keys and their results
+
+    The first request for a key runs the work; concurrent requests with the
+    same key wait for that result, and later requests get the stored result
+    until it expires. Failed work is not stored, so a retry runs it again.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at <= now]:
+            del self._entries[key]
+
+        # Drop the oldest completed entries first; in-flight work is never evicted
+        while len(self._entries) > self.max_entries:
+            for key, entry in self._entries.items():
+                if entry.future.done():
+                    del self._entries[key]
+                    break
+            else:
+                break
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: Optional[str],
+        func: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """
+        Run func once per key
+
+        Args:
+            key: Idempotency key for the request
+            fingerprint: Hash of the request body, or None to skip the check
+            func: Coroutine function doing the actual work
+
+        Returns:
+            Tuple of (result, replayed) where replayed is True if the result
+            came from an earlier or in-flight request
+        """
+        self._evict()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if fingerprint is not None and entry.fingerprint is not None and entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(f"Key {key} was already used with a different request")
+            # shield so a cancelled waiter does not cancel the original request
+            return await asyncio.shield(entry.future), True
+
+        entry = _Entry(fingerprint)
+        self._entries[key] = entry
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            del self._entries[key]
+            entry.future.cancel()
+            raise
+        except Exception as e:
+            del self._entries[key]
+            entry.future.set_exception(e)
+            # Mark the exception as retrieved when nobody is waiting on it
+            entry.future.exception()
+            raise
+
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        entry.future.set_result(result)
+        self._evict()
+        return result, False
@@ -0,0 +1,118 @@
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JsonFileView:
+    """
+    In-memory view of a JSON file of records keyed by id
+
+    The file is only re-read when its mtime, size or inode changes. Every
+    reload that changes something bumps a sequence number, and each record
+    remembers the sequence it last changed at, so clients can sync deltas
+    with a cursor and revalidate with an ETag instead of refetching the file.
+    While the file cannot be parsed the last good records are kept, so a
+    half-written file does not look like every record was deleted.
+    """
+
+    MISSING = "missing"
+    INVALID = "invalid"
+    OK = "ok"
+
+    def __init__(self, file_path: str, max_cached_payloads: int = 64, max_deleted: int = 1000):
+        self.file_path = file_path
+        self.max_cached_payloads = max_cached_payloads
+        self.max_deleted = max_deleted
+        # Cursors from a previous process cannot be trusted, so they carry a generation
+        self.generation = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.status = self.MISSING
+        self.records: Dict[str, Any] = {}
+        self._versions: Dict[str, int] = {}
+        self._deleted: Dict[str, int] = {}
+        # Cursors older than the newest forgotten deletion must resync in full
+        self._pruned_seq = 0
+        self._stat_key: Optional[Tuple[int, int, int]] = None
+        self._payloads: Dict[str, bytes] = {}
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.generation}.{self.seq}"
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.cursor}"'
+
+    def refresh(self) -> None:
+        """Reload the file if it changed on disk"""
+        try:
+            st = os.stat(self.file_path)
+            stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            stat_key = None
+        if stat_key == self._stat_key and self._stat_key is not None:
+            return
+        self._stat_key = stat_key
+
+        status, records = self.MISSING, {}
+        if stat_key is not None:
+            try:
+                # An empty file is usually one being rewritten, so it is invalid rather than missing
+                with open(self.file_path, "r") as f:
+                    records = json.load(f)
+                status = self.OK
+            except json.JSONDecodeError:
+                status = self.INVALID
+            except FileNotFoundError:
+                pass
+        if not isinstance(records, dict):
+            status = self.INVALID
+        if status == self.INVALID:
+            # Keep the last good records until the file can be read again
+            records = self.records
+
+        changed = [key for key, value in records.items() if key not in self.records or self.records[key] != value]
+        removed = [key for key in self.records if key not in records]
+        if not changed and not removed and status == self.status:
+            return
+
+        self.seq += 1
+        for key in changed:
+            self._versions[key] = self.seq
+            self._deleted.pop(key, None)
+        for key in removed:
+            del self._versions[key]
+            self._deleted[key] = self.seq
+        # Deletions are kept in the order they happened, so the oldest go first
+        while len(self._deleted) > self.max_deleted:
+            key = next(iter(self._deleted))
+            self._pruned_seq = self._deleted.pop(key)
+        self.status = status
+        self.records = records
+        self._payloads.clear()
+
+    def changes_since(self, cursor: str) -> Tuple[Dict[str, Any], List[str], bool]:
+        """
+        Get records created or modified after a cursor
+
+        Returns:
+            Tuple of (records, deleted keys, full_sync) where full_sync is True
+            when the cursor was not recognised and every record is returned
+        """
+        generation, _, seq = cursor.partition(".")
+        if generation != self.generation or not seq.isdigit() or int(seq) > self.seq or int(seq) < self._pruned_seq:
+            return dict(self.records), [], True
+
+        since = int(seq)
+        records = {key: self.records[key] for key, version in self._versions.items() if version > since}
+        deleted = [key for key, version in self._deleted.items() if version > since]
+        return records, deleted, False
+
+    def get_payload(self, variant: str) -> Optional[bytes]:
+        return self._payloads.get(variant)
+
+    def set_payload(self, variant: str, payload: bytes) -> None:
+        if len(self._payloads) >= self.max_cached_payloads:
+            self._payloads.pop(next(iter(self._payloads)))
+        self._payloads[variant] = payload
@@ -1,12 +1,18 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Header
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from mongo_db import db_manager
 import uvicorn
 from bson import ObjectId
 import json
-from blandai import router as bland_router
+from blandai import router as bland_router, bland_breaker
+from pipeline import router as pipeline_router
+from resilience import ConcurrencyLimiter, CircuitBreaker, CircuitOpenError, Overloaded, retry_after_header
+from fastapi.concurrency import run_in_threadpool
+import profiling
+from profiling import profile_span
+from extractors import extract_answers, fast_path_stats, is_valid_question
 import os
 from pydantic import BaseModel
 import openai
@@ -27,38 +33,82 @@ class MongoJSONEncoder(json.JSONEncoder):
 # Custom middleware to handle BSON ObjectId
 class CustomJSONResponse(JSONResponse):
     def render(self, content: Any) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-            cls=MongoJSONEncoder,
-        ).encode("utf-8")
+        with profile_span("serialize"):
+            return json.dumps(
+                content,
+                ensure_ascii=False,
+                allow_nan=False,
+                indent=None,
+                separators=(",", ":"),
+                cls=MongoJSONEncoder,
+            ).encode("utf-8")
 
 # Input model for the new endpoint
 class TranscriptRequest(BaseModel):
     transcript: str
     prompt: str
+    # Optional [question, answer_type] pairs; simple types are answered without OpenAI
+    questions: Optional[List[List[str]]] = None
 
 # Initialize FastAPI app
 app = FastAPI(title="Hackathon API")
 
-# Add CORS middleware to allow requests from any origin
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
-
 # Include the Bland AI router
 app.include_router(bland_router)
 
+# Include the populate cells pipeline router
+app.include_router(pipeline_router)
+
 #openai.api_key = os.getenv("OPENAIAPI_KEY")
 api_key = os.getenv("OPENAIAPI_KEY")
-client = openai.OpenAI(api_key=api_key)
+client = openai.OpenAI(api_key=api_key, timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", 60)))
+
+# Only outages, rate limits and timeouts should trip the breaker, not bad requests
+openai_breaker = CircuitBreaker(
+    "OpenAI",
+    failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURE_THRESHOLD", 5)),
+    slow_call_seconds=float(os.getenv("OPENAI_BREAKER_SLOW_CALL_SECONDS", 45)),
+    recovery_timeout=float(os.getenv("OPENAI_BREAKER_RECOVERY_SECONDS", 30)),
+    is_failure=lambda e: isinstance(e, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)),
+)
+
+# Admission control for routes that wait on upstream APIs, keyed by path prefix,
+# so a slow OpenAI or Bland cannot starve the /hackathon routes
+route_limiters = {
+    "/process-transcript": ConcurrencyLimiter(
+        max_concurrent=int(os.getenv("TRANSCRIPT_MAX_CONCURRENCY", 8)),
+        max_queue=int(os.getenv("TRANSCRIPT_MAX_QUEUE", 16)),
+        per_client=int(os.getenv("TRANSCRIPT_MAX_PER_CLIENT", 2)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5)),
+    ),
+    "/bland/": ConcurrencyLimiter(
+        max_concurrent=int(os.getenv("BLAND_MAX_CONCURRENCY", 16)),
+        max_queue=int(os.getenv("BLAND_MAX_QUEUE", 32)),
+        per_client=int(os.getenv("BLAND_MAX_PER_CLIENT", 4)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5)),
+    ),
+    "/pipeline/": ConcurrencyLimiter(
+        max_concurrent=int(os.getenv("PIPELINE_MAX_CONCURRENCY", 8)),
+        max_queue=int(os.getenv("PIPELINE_MAX_QUEUE", 16)),
+        per_client=int(os.getenv("PIPELINE_MAX_PER_CLIENT", 2)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5)),
+    ),
+}
+
+# Number of trusted proxies in front of the server, such as ngrok, that append to X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+
+def get_client_id(request: Request) -> str:
+    """
+    Identify the caller for per-client limits
+
+    Only the X-Forwarded-For entry added by the outermost trusted proxy is used;
+    entries further left are supplied by the client and could be spoofed.
+    """
+    forwarded_for = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if TRUSTED_PROXY_HOPS > 0 and len(forwarded_for) >= TRUSTED_PROXY_HOPS:
+        return forwarded_for[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
 
 # Add a middleware to handle MongoDB ObjectId
 @app.middleware("http")
@@ -66,6 +116,76 @@ async def add_custom_header(request: Request, call_next):
     response = await call_next(request)
     return response
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Reject requests with 503 when their route is saturated"""
+    limiter = next((l for prefix, l in route_limiters.items() if request.url.path.startswith(prefix)), None)
+    if limiter is None or request.method == "OPTIONS":
+        return await call_next(request)
+    try:
+        async with limiter.acquire(get_client_id(request)):
+            return await call_next(request)
+    except Overloaded as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers=retry_after_header(e.retry_after))
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Record a profile for requests sent with an authorized X-Profile header or picked by sampling"""
+    reason = profiling.should_profile(request.headers.get("x-profile"))
+    if reason is None:
+        return await call_next(request)
+
+    profile, token = profiling.start_profile(request.method, request.url.path, reason)
+    status_code = None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Profile-Id"] = profile.id
+        return response
+    finally:
+        profiling.finish_profile(profile, token, status_code)
+
+# Add CORS middleware to allow requests from any origin
+# Registered after the other middleware so it is outermost and 503s carry CORS headers
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allows all origins
+    allow_credentials=True,
+    allow_methods=["*"],  # Allows all methods
+    allow_headers=["*"],  # Allows all headers
+)
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=retry_after_header(exc.retry_after))
+
+@app.get("/health/upstreams")
+async def get_upstream_health():
+    """Get the circuit breaker state for each upstream API"""
+    return {"upstreams": [bland_breaker.status(), openai_breaker.status()]}
+
+def require_admin(x_admin_token: Optional[str]) -> None:
+    # Admin endpoints are hidden unless PROFILING_TOKEN is configured
+    if not profiling.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.is_profiling_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profiles")
+async def get_profiles(x_admin_token: Optional[str] = Header(None)):
+    """List the most recent request profiles, newest first"""
+    require_admin(x_admin_token)
+    return {"profiles": profiling.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Get a request profile in collapsed stack format for flamegraph.pl or speedscope"""
+    require_admin(x_admin_token)
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed())
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_db_client():
@@ -125,36 +245,78 @@ async def process_transcript(request: TranscriptRequest):
     """
     Process a phone transcript with a specific prompt using OpenAI API
     and return structured data
+
+    When typed questions are given, answers that can be extracted locally
+    skip OpenAI, and the response reports where each answer came from
     """
+    if request.questions and not all(is_valid_question(entry) for entry in request.questions):
+        raise HTTPException(status_code=400, detail="Each question must be a [question, answer_type] pair")
+
     try:
-        # Create the OpenAI API request
-        response = client.chat.completions.create(
-            model= "gpt-4o",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts structured data from phone call transcripts. Return only valid JSON."},
-                {"role": "user", "content": f"Here is a phone transcript:\n\n{request.transcript}\n\nExtract the following information based on this prompt: {request.prompt}"}
-            ]
-        )
+        structured_data = {}
+        provenance = {}
+        remaining = []
+        if request.questions:
+            with profile_span("extract"):
+                extractions = extract_answers(request.transcript, request.questions)
+            for entry, extraction in zip(request.questions, extractions):
+                if extraction is None:
+                    remaining.append(entry)
+                    continue
+                structured_data[entry[0]] = extraction.value
+                provenance[entry[0]] = extraction.provenance()
+
+        if not request.questions or remaining:
+            prompt = request.prompt
+            if remaining:
+                prompt += f"\n\nAnswer only these [question, answer_type] pairs, as a JSON object keyed by the exact question text: {json.dumps(remaining)}"
+
+            # Create the OpenAI API request off the event loop, through the breaker
+            with profile_span("openai.chat"):
+                response = await run_in_threadpool(
+                    openai_breaker.call,
+                    client.chat.completions.create,
+                    model= "gpt-4o",
+                    response_format={"type": "json_object"},
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant that extracts structured data from phone call transcripts. Return only valid JSON."},
+                        {"role": "user", "content": f"Here is a phone transcript:\n\n{request.transcript}\n\nExtract the following information based on this prompt: {prompt}"}
+                    ]
+                )
+
+            # Parse the JSON response
+            with profile_span("serialize"):
+                llm_data = json.loads(response.choices[0].message.content)
+            print(llm_data)
+
+            if request.questions:
+                for entry in remaining:
+                    structured_data[entry[0]] = llm_data.get(entry[0])
+                    provenance[entry[0]] = {"source": "openai"}
+            else:
+                structured_data = llm_data
 
-        # Parse the JSON response
-        structured_data = json.loads(response.choices[0].message.content)
-        print(structured_data)
         # Store the result in the database
         result = await db_manager.create_transcript_result({
             "transcript": request.transcript,
             "prompt": request.prompt,
             "result": structured_data,
+            "provenance": provenance,
             "created_at": datetime.utcnow()
         })
 
         # Return both the structured data and the database entry ID
-        return CustomJSONResponse(content={
+        content = {
             "success": True,
             "data": structured_data,
             "result_id": result.get("id")
-        })
+        }
+        if request.questions:
+            content["provenance"] = provenance
+        return CustomJSONResponse(content=content)
 
+    except CircuitOpenError:
+        raise
     except openai.OpenAIError as e:
         raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
     except json.JSONDecodeError:
@@ -162,5 +324,10 @@ async def process_transcript(request: TranscriptRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing transcript: {str(e)}")
 
+@app.get("/extraction/stats")
+async def get_extraction_stats():
+    """Get how often typed questions were answered without calling an LLM"""
+    return fast_path_stats.summary()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
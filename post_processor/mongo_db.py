@@ -1,9 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 from bson import ObjectId
 import os
+from profiling import profiled
 
 load_dotenv()
 
@@ -40,6 +42,7 @@ class HackathonDBManager:
         
         return document
 
+    @profiled("mongo.create_hackathon_entry")
     async def create_hackathon_entry(self, data: Dict) -> dict:
         """Create a new entry in hackathon collection"""
         # Extract id from data if it exists, otherwise let MongoDB generate one
@@ -59,6 +62,7 @@ class HackathonDBManager:
         result = await self.db.hackathon.insert_one(document)
         return {"id": str(result.inserted_id), "success": True, "message": "Entry created successfully"}
 
+    @profiled("mongo.update_hackathon_entry")
     async def update_hackathon_entry(self, entry_id: str, data: Dict) -> dict:
         """Update an existing entry in hackathon collection"""
         try:
@@ -77,6 +81,45 @@ class HackathonDBManager:
         except Exception:
             return {"success": False, "message": "Invalid ID format"}
 
+    @profiled("mongo.bulk_update_hackathon_fields")
+    async def bulk_update_hackathon_fields(self, updates: Dict[str, Dict[str, Any]]) -> dict:
+        """Set individual data fields on many hackathon entries in one round trip"""
+        operations = []
+        object_ids = []
+        invalid_ids = []
+        for entry_id, fields in updates.items():
+            try:
+                object_id = ObjectId(entry_id)
+            except Exception:
+                invalid_ids.append(entry_id)
+                continue
+            # Set fields inside data so the entry's other cells are left alone
+            changes = {f"data.{field}": value for field, value in fields.items()}
+            changes["updated_at"] = datetime.utcnow()
+            operations.append(UpdateOne({"_id": object_id}, {"$set": changes}))
+            object_ids.append(object_id)
+
+        matched_count = 0
+        modified_count = 0
+        missing_ids = []
+        if operations:
+            # bulk_write only reports totals, so look up which entries exist first
+            existing = {doc["_id"] async for doc in self.db.hackathon.find({"_id": {"$in": object_ids}}, {"_id": 1})}
+            missing_ids = [str(object_id) for object_id in object_ids if object_id not in existing]
+
+            result = await self.db.hackathon.bulk_write(operations, ordered=False)
+            matched_count = result.matched_count
+            modified_count = result.modified_count
+        return {
+            "success": True,
+            "matched_count": matched_count,
+            "modified_count": modified_count,
+            "invalid_ids": invalid_ids,
+            "missing_ids": missing_ids,
+            "message": "Entries updated successfully"
+        }
+
+    @profiled("mongo.delete_hackathon_entry")
     async def delete_hackathon_entry(self, entry_id: str) -> dict:
         """Delete an entry from hackathon collection"""
         try:
@@ -87,6 +130,7 @@ class HackathonDBManager:
         except Exception:
             return {"success": False, "message": "Invalid ID format"}
 
+    @profiled("mongo.get_hackathon_entry")
     async def get_hackathon_entry(self, entry_id: str) -> Optional[dict]:
         """Get a single entry from hackathon collection"""
         try:
@@ -95,6 +139,7 @@ class HackathonDBManager:
         except Exception:
             return None
 
+    @profiled("mongo.get_all_hackathon_entries")
     async def get_all_hackathon_entries(self) -> List[dict]:
         """Get all entries from hackathon collection"""
         entries = []
@@ -102,6 +147,7 @@ class HackathonDBManager:
             entries.append(self._process_document(entry))
         return entries
 
+    @profiled("mongo.create_transcript_result")
     async def create_transcript_result(self, data):
         """Create a new transcript processing result"""
         # Add timestamp if not present
@@ -115,6 +161,7 @@ class HackathonDBManager:
             "message": "Transcript result created successfully"
         }
     
+    @profiled("mongo.get_transcript_result")
     async def get_transcript_result(self, result_id):
         """Get a transcript result by ID"""
         try:
@@ -125,6 +172,7 @@ class HackathonDBManager:
         result = await self.db.transcript_results.find_one({"_id": result_id_obj})
         return result
     
+    @profiled("mongo.get_transcript_results_by_query")
     async def get_transcript_results_by_query(self, query=None, limit=100, skip=0):
         """Get transcript results with optional filtering"""
         if query is None:
@@ -0,0 +1,221 @@
+import asyncio
+import contextvars
+import datetime
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+from mongo_db import db_manager
+from blandai import (
+    place_call_once_per_number, wait_for_call_completion, analyze_with_fast_path,
+    DuplicateCallConflict, FAILED_CALL_STATUSES,
+)
+from resilience import CircuitOpenError
+
+# Load environment variables
+load_dotenv()
+
+PIPELINE_MAX_CONCURRENT_CALLS = int(os.getenv("PIPELINE_MAX_CONCURRENT_CALLS", 4))
+PIPELINE_CALL_TIMEOUT_SECONDS = float(os.getenv("PIPELINE_CALL_TIMEOUT_SECONDS", 900))
+PIPELINE_POLL_INTERVAL_SECONDS = float(os.getenv("PIPELINE_POLL_INTERVAL_SECONDS", 10))
+PIPELINE_MAX_JOBS = int(os.getenv("PIPELINE_MAX_JOBS", 100))
+# Public URL of POST /bland/calls/webhook, so finished calls are picked up without waiting for a poll
+PIPELINE_WEBHOOK_URL = os.getenv("PIPELINE_WEBHOOK_URL")
+
+# Create router
+router = APIRouter(prefix="/pipeline", tags=["pipeline"])
+
+# Most recent jobs by id, oldest finished jobs dropped first
+pipeline_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# Keep references to running jobs so they are not garbage collected
+_running_tasks = set()
+# Shared by all jobs, so concurrent jobs cannot multiply the number of calls in progress
+call_slots = asyncio.Semaphore(PIPELINE_MAX_CONCURRENT_CALLS)
+
+class PipelineCell(BaseModel):
+    entry_id: str = Field(..., description="ID of the hackathon entry holding the cell")
+    field: str = Field(..., description="Field inside the entry's data to write the answer to")
+    phone_number: str = Field(..., description="The phone number to call in E.164 format")
+    question: str = Field(..., description="Question whose answer fills the cell")
+    answer_type: str = Field("string", description="Answer type, e.g. number, boolean or string")
+
+class PopulateCellsRequest(BaseModel):
+    cells: List[PipelineCell] = Field(..., description="Cells to fill; cells sharing a phone number share one call")
+    goal: str = Field(..., description="The goal for analyzing the calls")
+    task: Optional[str] = Field(None, description="Instructions for the AI agent, built from the questions if omitted")
+    voice: Optional[str] = Field(None, description="Voice ID or preset name")
+    wait_for_greeting: Optional[bool] = Field(None, description="Wait for recipient to speak first")
+    from_number: Optional[str] = Field(None, description="Phone number to call from")
+
+def build_task(goal: str, questions: List[str]) -> str:
+    numbered = " ".join(f"{i}) {question}" for i, question in enumerate(questions, 1))
+    return f"You are a friendly assistant. {goal} Please ask the following questions in order: {numbered}"
+
+def set_cells(cells: List[Dict[str, Any]], **changes) -> None:
+    for cell in cells:
+        cell.update(changes)
+
+async def populate_number(job: Dict[str, Any], request: PopulateCellsRequest, cells: List[Dict[str, Any]]) -> None:
+    """Call one number once, then extract the answers for all of its cells"""
+    # The same question may be asked for several entries sharing the number
+    questions: List[List[str]] = []
+    for cell in cells:
+        if [cell["question"], cell["answer_type"]] not in questions:
+            questions.append([cell["question"], cell["answer_type"]])
+
+    async with call_slots:
+        call_data = {
+            "phone_number": cells[0]["phone_number"],
+            "task": request.task or build_task(request.goal, [question for question, _ in questions]),
+            "voice": request.voice,
+            "wait_for_greeting": request.wait_for_greeting,
+            "from": request.from_number,
+            "webhook": PIPELINE_WEBHOOK_URL,
+            "metadata": {"pipeline_job_id": job["job_id"]},
+        }
+        call_data = {key: value for key, value in call_data.items() if value is not None}
+
+        set_cells(cells, status="dialing")
+        try:
+            call_response, _ = await place_call_once_per_number(call_data)
+        except (HTTPException, CircuitOpenError, DuplicateCallConflict) as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            set_cells(cells, status="failed", error=f"Call failed: {error}")
+            return
+
+        call_id = call_response["call_id"]
+        set_cells(cells, status="in_call", call_id=call_id)
+        try:
+            details = await wait_for_call_completion(call_id, PIPELINE_CALL_TIMEOUT_SECONDS, PIPELINE_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError as e:
+            set_cells(cells, status="failed", error=str(e))
+            return
+
+    if details.get("status") in FAILED_CALL_STATUSES:
+        set_cells(cells, status="failed", error=f"Call ended with status {details['status']}")
+        return
+
+    # The call slot is free again while the answers are extracted
+    set_cells(cells, status="extracting")
+    try:
+        analysis = await analyze_with_fast_path(call_id, {"goal": request.goal, "questions": questions}, details)
+    except (HTTPException, CircuitOpenError) as e:
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        set_cells(cells, status="failed", error=f"Analysis failed: {error}")
+        return
+
+    for cell in cells:
+        position = questions.index([cell["question"], cell["answer_type"]])
+        answer, provenance = analysis["answers"][position], analysis["provenance"][position]
+        if answer is None:
+            cell.update(status="unanswered", source=provenance["source"])
+        else:
+            cell.update(status="answered", answer=answer, source=provenance["source"])
+
+async def run_populate_job(job: Dict[str, Any], request: PopulateCellsRequest) -> None:
+    """Dial every number concurrently, then write all answers back in one bulk update"""
+    # One call per number, so a number shared by several entries is not rung twice at once
+    numbers: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for cell in job["cells"]:
+        numbers.setdefault(cell["phone_number"], []).append(cell)
+
+    try:
+        results = await asyncio.gather(
+            *(populate_number(job, request, cells) for cells in numbers.values()),
+            return_exceptions=True,
+        )
+        for cells, result in zip(numbers.values(), results):
+            if isinstance(result, Exception):
+                set_cells([c for c in cells if c["status"] not in ("answered", "unanswered")],
+                          status="failed", error=f"Unexpected error: {result}")
+
+        answered = [cell for cell in job["cells"] if cell["status"] == "answered"]
+        updates: Dict[str, Dict[str, Any]] = {}
+        for cell in answered:
+            updates.setdefault(cell["entry_id"], {})[cell["field"]] = cell["answer"]
+
+        if updates:
+            job["status"] = "writing"
+            try:
+                result = await db_manager.bulk_update_hackathon_fields(updates)
+            except Exception as e:
+                set_cells(answered, status="failed", error=f"Write failed: {e}")
+            else:
+                not_found = {entry_id: "Invalid ID format" for entry_id in result["invalid_ids"]}
+                not_found.update({entry_id: "Entry not found" for entry_id in result["missing_ids"]})
+                for cell in answered:
+                    if cell["entry_id"] in not_found:
+                        cell.update(status="failed", error=not_found[cell["entry_id"]])
+                    else:
+                        cell["status"] = "written"
+    finally:
+        job["status"] = "completed"
+        job["completed_at"] = datetime.datetime.now().isoformat()
+
+def job_summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for cell in job["cells"]:
+        counts[cell["status"]] = counts.get(cell["status"], 0) + 1
+    return {**job, "progress": counts}
+
+@router.post("/populate", status_code=202)
+async def populate_cells(request: PopulateCellsRequest):
+    """
+    Fill spreadsheet cells by calling each number and extracting the answers
+
+    Returns a job straight away; poll GET /pipeline/jobs/{job_id} for per-cell progress
+    """
+    if not request.cells:
+        raise HTTPException(status_code=400, detail="At least one cell must be provided")
+    targets = set()
+    for cell in request.cells:
+        # Check ids before dialing anything, since a bad id is only noticed at write-back
+        if not ObjectId.is_valid(cell.entry_id):
+            raise HTTPException(status_code=400, detail=f"Invalid ID format: {cell.entry_id}")
+        # Fields become Mongo paths under data, so they cannot nest or be operators
+        if not cell.field or "." in cell.field or cell.field.startswith("$"):
+            raise HTTPException(status_code=400, detail=f"Invalid field name: {cell.field}")
+        # Two answers for one cell would silently overwrite each other at write-back
+        if (cell.entry_id, cell.field) in targets:
+            raise HTTPException(status_code=400, detail=f"Duplicate cell: {cell.entry_id} {cell.field}")
+        targets.add((cell.entry_id, cell.field))
+
+    job_id = uuid.uuid4().hex
+    job = {
+        "job_id": job_id,
+        "status": "running",
+        "created_at": datetime.datetime.now().isoformat(),
+        "completed_at": None,
+        "cells": [
+            dict(cell.dict(), status="pending", call_id=None, answer=None, source=None, error=None)
+            for cell in request.cells
+        ],
+    }
+
+    pipeline_jobs[job_id] = job
+    while len(pipeline_jobs) > PIPELINE_MAX_JOBS:
+        oldest = next((key for key, value in pipeline_jobs.items() if value["status"] == "completed"), None)
+        if oldest is None:
+            break
+        del pipeline_jobs[oldest]
+
+    # Run in a fresh context so the job is not recorded into this request's profile
+    task = contextvars.Context().run(asyncio.create_task, run_populate_job(job, request))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+    return job_summary(job)
+
+@router.get("/jobs/{job_id}")
+async def get_populate_job(job_id: str):
+    """
+    Get the per-cell progress of a populate job
+    """
+    job = pipeline_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_summary(job)
@@ -0,0 +1,244 @@
+import contextvars
+import functools
+import hmac
+import inspect
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Profiling is off unless a request sends X-Profile with this token or is sampled
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", 50))
+
+
+def _thread_cpu_clock() -> Optional[int]:
+    """Get a clock for the calling thread's CPU time that other threads can read"""
+    try:
+        return time.pthread_getcpuclockid(threading.get_ident())
+    except (AttributeError, OSError):
+        return None
+
+
+class RequestProfile:
+    """
+    Timings for a single request, aggregated by span stack
+
+    Spans may be recorded from threadpool workers, so updates take a lock.
+    CPU time is the event loop thread's CPU time while no top-level span is
+    open, so it is the request's own work plus whatever other requests ran
+    on the loop while this one awaited something uninstrumented.
+    """
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = time.time()
+        self.wall_seconds = 0.0
+        self.status_code: Optional[int] = None
+        self._start = time.perf_counter()
+        self._stacks: Dict[Tuple[str, ...], float] = {}
+        # (start, end) of top-level spans, to find the wall time no span covers
+        self._intervals: List[Tuple[float, float]] = []
+        self._open_spans = 0
+        # Profiles are started on the event loop thread
+        self._thread = threading.get_ident()
+        self._cpu_clock = _thread_cpu_clock()
+        self._cpu_mark: Optional[float] = self._cpu_time()
+        self.cpu_seconds = 0.0
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def _cpu_time(self) -> Optional[float]:
+        if self._cpu_clock is not None:
+            return time.clock_gettime(self._cpu_clock)
+        # Without a per-thread clock id the loop's CPU time can only be read on the loop
+        if threading.get_ident() == self._thread:
+            return time.thread_time()
+        return None
+
+    def _end_cpu_interval(self) -> None:
+        now = self._cpu_time()
+        if now is not None and self._cpu_mark is not None:
+            self.cpu_seconds += now - self._cpu_mark
+        self._cpu_mark = None
+
+    def enter(self, stack: Tuple[str, ...]) -> None:
+        if len(stack) != 1:
+            return
+        with self._lock:
+            if self._finished:
+                return
+            if self._open_spans == 0:
+                self._end_cpu_interval()
+            self._open_spans += 1
+
+    def add(self, stack: Tuple[str, ...], start: float, end: float) -> None:
+        with self._lock:
+            # Work that outlives the request, such as a background task, is not part of it
+            if self._finished:
+                return
+            self._stacks[stack] = self._stacks.get(stack, 0.0) + end - start
+            if len(stack) == 1:
+                self._intervals.append((start, end))
+                self._open_spans -= 1
+                if self._open_spans == 0:
+                    self._cpu_mark = self._cpu_time()
+
+    def finish(self, status_code: Optional[int]) -> None:
+        with self._lock:
+            if self._open_spans == 0:
+                self._end_cpu_interval()
+            self._finished = True
+            self.wall_seconds = time.perf_counter() - self._start
+            self.status_code = status_code
+
+    def _covered_seconds(self) -> float:
+        """Wall time inside at least one top-level span, counting overlaps once"""
+        covered, reached = 0.0, self._start
+        for start, end in sorted(self._intervals):
+            start = max(start, reached)
+            if end > start:
+                covered += end - start
+                reached = end
+        return covered
+
+    def _self_times(self) -> Dict[Tuple[str, ...], float]:
+        # Spans hold inclusive time; flamegraphs want each frame's own time
+        self_times = dict(self._stacks)
+        for stack, seconds in self._stacks.items():
+            parent = stack[:-1]
+            if parent in self_times:
+                self_times[parent] -= seconds
+        # Wall time outside every span is CPU work on the loop, and otherwise
+        # uninstrumented waits and time spent waiting for the event loop
+        uncovered = self.wall_seconds - self._covered_seconds()
+        cpu = min(self.cpu_seconds, max(uncovered, 0.0))
+        self_times[("cpu",)] = cpu
+        self_times[("other",)] = uncovered - cpu
+        return {stack: max(seconds, 0.0) for stack, seconds in self_times.items()}
+
+    def collapsed(self) -> str:
+        """Render in collapsed stack format for flamegraph.pl or speedscope, in microseconds"""
+        root = f"{self.method} {self.path}"
+        lines = []
+        for stack, seconds in sorted(self._self_times().items()):
+            micros = int(seconds * 1_000_000)
+            if micros > 0:
+                lines.append(f"{';'.join((root,) + stack)} {micros}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        totals: Dict[str, float] = {}
+        for stack, seconds in self._self_times().items():
+            category = stack[-1].split(".")[0]
+            totals[category] = totals.get(category, 0.0) + seconds
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_seconds * 1000, 3),
+            "breakdown_ms": {category: round(seconds * 1000, 3) for category, seconds in sorted(totals.items())},
+        }
+
+
+# The active profile and the span stack leading to the current code
+_current: "contextvars.ContextVar[Optional[Tuple[RequestProfile, Tuple[str, ...]]]]" = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+# Most recent profiles, oldest dropped first
+recent_profiles: Deque[RequestProfile] = deque(maxlen=PROFILING_MAX_PROFILES)
+
+
+def is_profiling_token(value: Optional[str]) -> bool:
+    """Check a header against PROFILING_TOKEN in constant time"""
+    if not PROFILING_TOKEN or value is None:
+        return False
+    return hmac.compare_digest(value.encode("utf-8"), PROFILING_TOKEN.encode("utf-8"))
+
+
+def should_profile(profile_header: Optional[str]) -> Optional[str]:
+    """Decide whether to profile a request, returning the reason or None"""
+    if is_profiling_token(profile_header):
+        return "requested"
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def start_profile(method: str, path: str, reason: str) -> Tuple[RequestProfile, contextvars.Token]:
+    profile = RequestProfile(method, path, reason)
+    return profile, _current.set((profile, ()))
+
+
+def finish_profile(profile: RequestProfile, token: contextvars.Token, status_code: Optional[int]) -> None:
+    _current.reset(token)
+    profile.finish(status_code)
+    recent_profiles.append(profile)
+
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    return next((p for p in recent_profiles if p.id == profile_id), None)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    return [p.summary() for p in reversed(recent_profiles)]
+
+
+@contextmanager
+def profile_span(name: str):
+    """
+    Time a block against the current request profile, if there is one
+
+    Works around awaits and inside threadpool workers. Names are dotted with
+    the category first, e.g. "mongo.find" or "openai.chat".
+    """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+
+    profile, parent = current
+    stack = parent + (name,)
+    token = _current.set((profile, stack))
+    profile.enter(stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(stack, start, time.perf_counter())
+        _current.reset(token)
+
+
+def profiled(name: str):
+    """Decorator form of profile_span for sync and async functions"""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with profile_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,176 @@
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from profiling import profile_span
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the upstream circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, circuit breaker is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    """Format a Retry-After header, rounded up to whole seconds"""
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent requests for a route, overall and per client
+
+    Requests over the overall cap wait in a bounded queue; requests that find
+    the queue full, wait longer than queue_timeout, or exceed their client's
+    cap are rejected straight away with Overloaded.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, per_client: int, queue_timeout: float = 5.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_client = per_client
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        # Counted before any await, since the semaphore is only taken once the
+        # waiting task runs and would look free to a burst arriving in one tick
+        self._active = 0
+        self._waiting = 0
+        self._clients: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, client_id: str):
+        if self._clients.get(client_id, 0) >= self.per_client:
+            raise Overloaded("Too many concurrent requests from this client", self.queue_timeout)
+
+        if self._active + self._waiting >= self.max_concurrent + self.max_queue:
+            raise Overloaded("Server is busy, request queue is full", self.queue_timeout)
+
+        # Count the client before waiting so it cannot flood the queue
+        self._clients[client_id] = self._clients.get(client_id, 0) + 1
+        try:
+            self._waiting += 1
+            try:
+                with profile_span("admission.wait"):
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded("Server is busy, timed out waiting in queue", self.queue_timeout)
+            finally:
+                self._waiting -= 1
+
+            self._active += 1
+            try:
+                yield
+            finally:
+                self._active -= 1
+                self._semaphore.release()
+        finally:
+            self._clients[client_id] -= 1
+            if self._clients[client_id] == 0:
+                del self._clients[client_id]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around a blocking upstream client
+
+    Errors and calls slower than slow_call_seconds count as failures. After
+    failure_threshold consecutive failures the circuit opens and calls fail
+    fast with CircuitOpenError. Once recovery_timeout has passed the circuit
+    half-opens and lets a single probe call through: success closes it again,
+    failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_seconds: float = 30.0,
+        recovery_timeout: float = 30.0,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.recovery_timeout = recovery_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        # Bumped on every state change; results from calls admitted under an
+        # older generation no longer describe the current state and are ignored
+        self._generation = 0
+        # Calls run in the threadpool, so state changes need a real lock
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+        self._probing = False
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        elif state == self.CLOSED:
+            self.failures = 0
+
+    def _before_call(self) -> int:
+        """Admit a call, returning the generation it was admitted under"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self._generation
+            remaining = self.opened_at + self.recovery_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return self._generation
+            raise CircuitOpenError(self.name, max(remaining, 1))
+
+    def _record(self, generation: int, failed: bool) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self.state == self.HALF_OPEN:
+                # Only the probe is admitted while half-open, so this is its result
+                self._transition(self.OPEN if failed else self.CLOSED)
+            elif not failed:
+                self.failures = 0
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._transition(self.OPEN)
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call func through the breaker"""
+        generation = self._before_call()
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._record(generation, self.is_failure(e))
+            raise
+        except BaseException:
+            # Treat an interrupted probe as a failure so the breaker is not stuck half-open
+            self._record(generation, True)
+            raise
+        self._record(generation, time.monotonic() - start > self.slow_call_seconds)
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {"name": self.name, "state": self.state, "failures": self.failures}
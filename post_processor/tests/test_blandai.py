@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+import blandai
+from blandai import call_completed_webhook, call_completions, wait_for_call_completion
+
+
+def test_webhook_wakes_every_waiter_on_a_call(monkeypatch):
+    finished = set()
+
+    def fake_bland(endpoint, method="GET", data=None):
+        call_id = endpoint.split("/")[1]
+        return {"status": "completed" if call_id in finished else "in-progress"}
+
+    monkeypatch.setattr(blandai, "call_bland_api", fake_bland)
+
+    async def scenario():
+        # Two jobs handed the same call by the duplicate-number window
+        first = asyncio.create_task(wait_for_call_completion("call-1", timeout=5, poll_interval=60))
+        second = asyncio.create_task(wait_for_call_completion("call-1", timeout=5, poll_interval=60))
+        await asyncio.sleep(0.05)
+        assert len(call_completions["call-1"]) == 2
+
+        finished.add("call-1")
+        await call_completed_webhook({"call_id": "call-1"})
+        # Neither waiter should have to wait for the next poll
+        return await asyncio.wait_for(asyncio.gather(first, second), timeout=1)
+
+    results = asyncio.run(scenario())
+    assert [details["status"] for details in results] == ["completed", "completed"]
+    assert "call-1" not in call_completions
+
+
+def test_finished_waiter_leaves_other_waiters_registered(monkeypatch):
+    monkeypatch.setattr(blandai, "call_bland_api", lambda endpoint, method="GET", data=None: {"status": "in-progress"})
+
+    async def scenario():
+        short = asyncio.create_task(wait_for_call_completion("call-2", timeout=0.05, poll_interval=60))
+        long = asyncio.create_task(wait_for_call_completion("call-2", timeout=5, poll_interval=60))
+        with pytest.raises(asyncio.TimeoutError):
+            await short
+        remaining = len(call_completions.get("call-2", ()))
+        long.cancel()
+        await asyncio.gather(long, return_exceptions=True)
+        return remaining
+
+    assert asyncio.run(scenario()) == 1
+    assert "call-2" not in call_completions
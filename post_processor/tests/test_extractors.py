@@ -0,0 +1,132 @@
+import pytest
+
+from extractors import FAST_PATH_MIN_CONFIDENCE, extract_answers, extract_boolean, extract_date, extract_number, extract_price, has_fast_path
+
+
+def transcript(question, reply):
+    return f"assistant: Hi, thanks for picking up.\nuser: Hello.\nassistant: {question}\nuser: {reply}\n"
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("Yes, speaking.", True),
+    ("Yeah definitely", True),
+    ("Of course", True),
+    ("No", False),
+    ("Nope, sorry", False),
+    ("Absolutely not", False),
+    ("Definitely not, it was awful", False),
+    ("Of course not!", False),
+    ("Not really", False),
+    ("I don't think so", False),
+    # Idioms that contain "no" but mean yes
+    ("No problem!", True),
+    ("No worries, happy to", True),
+    ("Never been better", True),
+    ("Why not", True),
+    # Other negations are too subtle for a rule, so they go to the LLM
+    ("Yes, I don't mind", None),
+    ("I'm not sure, maybe", None),
+    ("Yes and no", None),
+    ("Hmm, let me think", None),
+])
+def test_extract_boolean(answer, expected):
+    extraction = extract_boolean(answer, "Would you attend again?")
+    assert (extraction.value if extraction else None) == expected
+
+
+@pytest.mark.parametrize("answer, question, expected", [
+    ("I'd say an eight out of ten.", "On a scale of 1-10, how was it?", 8),
+    ("7", "On a scale of 1 to 10, how was it?", 7),
+    ("8/10", "On a scale of 1-10, how was it?", 8),
+    ("Maybe 8 or 9", "On a scale of 1-10, how was it?", None),
+    ("Easily 15", "On a scale of 1-10, how was it?", None),
+    ("About 12 people", "How many people were in your team?", 12),
+    ("No idea", "How many people were in your team?", None),
+])
+def test_extract_number(answer, question, expected):
+    extraction = extract_number(answer, question)
+    assert (extraction.value if extraction else None) == expected
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("It was £25.", "£25"),
+    ("$1,200.50 in total", "$1200.50"),
+    ("About 30 pounds", "£30"),
+    ("Either £20 or £25", None),
+    ("It was free", None),
+])
+def test_extract_price(answer, expected):
+    extraction = extract_price(answer, "How much did the ticket cost?")
+    assert (extraction.value if extraction else None) == expected
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("On the 3rd of March 2025.", "2025-03-03"),
+    ("2025-03-08", "2025-03-08"),
+    ("March 12th, 2025", "2025-03-12"),
+    ("5 Sept 2024", "2024-09-05"),
+    ("Jan. 5", "--01-05"),
+    # Words that merely start like a month are not dates
+    ("We need 3 marketing reports", None),
+    ("2 decent options", None),
+    ("2 junior sessions", None),
+    ("31 February 2025", None),
+])
+def test_extract_date(answer, expected):
+    extraction = extract_date(answer, "What date did you arrive?")
+    assert (extraction.value if extraction else None) == expected
+
+
+def test_extract_answers_matches_reply_to_question():
+    text = transcript("On a scale of 1 to 10, how would you rate the hackathon?", "Nine, easily.")
+    questions = [
+        ["On a scale of 1-10, how would the participant rate the hackathon?", "number"],
+        ["What did the participant enjoy the most?", "string"],
+    ]
+    rating, enjoyed = extract_answers(text, questions)
+    assert rating.value == 9
+    assert rating.provenance()["source"] == "rule:rating"
+    assert enjoyed is None
+
+
+@pytest.mark.parametrize("questions", [
+    [[]],
+    [["", "number"]],
+    [["Rate it", 3]],
+    ["Rate it"],
+])
+def test_extract_answers_skips_malformed_questions(questions):
+    assert extract_answers(transcript("Rate it", "8"), questions) == [None]
+    assert not has_fast_path(questions)
+
+
+def test_has_fast_path():
+    assert has_fast_path([["On a scale of 1-10, how was it?", "number"]])
+    assert not has_fast_path([["What did the participant enjoy the most?", "string"]])
+
+
+@pytest.mark.parametrize("answer, question, low_confidence", [
+    ("Yes", "Would you attend again?", False),
+    ("Yes, although the venue was far from home and parking was hard", "Would you attend again?", True),
+    ("8", "On a scale of 1-10, how was it?", False),
+    ("8", "How many people were in your team?", True),
+    ("March 12th, 2025", "What date did you arrive?", False),
+    ("March 12th", "What date did you arrive?", True),
+    ("£25", "How much did the ticket cost?", False),
+    ("£25 for 2 days", "How much did the ticket cost?", True),
+])
+def test_confidence_reflects_evidence(answer, question, low_confidence):
+    extractor = {"Would": extract_boolean, "On a": extract_number, "How many": extract_number,
+                 "What date": extract_date, "How much": extract_price}
+    extract = next(func for prefix, func in extractor.items() if question.startswith(prefix))
+    extraction = extract(answer, question)
+    assert (extraction.confidence < 0.9) == low_confidence
+
+
+def test_loosely_matched_question_is_left_for_llm():
+    question = ["Would the participant attend the hackathon again next year?", "boolean"]
+    exact = extract_answers(transcript("Would you attend the hackathon again next year?", "Sure, that sounds good to me"), [question])
+    loose = extract_answers(transcript("Would you attend again next time?", "Sure, that sounds good to me"), [question])
+    assert exact[0].value is True
+    assert exact[0].confidence >= FAST_PATH_MIN_CONFIDENCE
+    assert loose == [None]
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyConflict, IdempotencyStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_in_flight_waiters_get_original_result():
+    async def scenario():
+        store = IdempotencyStore()
+        calls = []
+        release = asyncio.Event()
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return {"call_id": "abc"}
+
+        tasks = [asyncio.create_task(store.run("key", "fp", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return calls, await asyncio.gather(*tasks)
+
+    calls, results = run(scenario())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == [{"call_id": "abc"}] * 3
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+
+def test_replays_completed_result():
+    async def scenario():
+        store = IdempotencyStore()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return len(calls)
+
+        first = await store.run("key", "fp", work)
+        second = await store.run("key", "fp", work)
+        return first, second, calls
+
+    first, second, calls = run(scenario())
+    assert first == (1, False)
+    assert second == (1, True)
+    assert len(calls) == 1
+
+
+def test_reused_key_with_different_fingerprint_conflicts():
+    async def scenario():
+        store = IdempotencyStore()
+
+        async def work():
+            return "done"
+
+        await store.run("key", "fp-1", work)
+        await store.run("key", "fp-2", work)
+
+    with pytest.raises(IdempotencyConflict):
+        run(scenario())
+
+
+def test_failures_are_not_stored():
+    async def scenario():
+        store = IdempotencyStore()
+        attempts = []
+
+        async def work():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("upstream failed")
+            return "done"
+
+        with pytest.raises(RuntimeError):
+            await store.run("key", "fp", work)
+        return await store.run("key", "fp", work), attempts
+
+    result, attempts = run(scenario())
+    assert result == ("done", False)
+    assert len(attempts) == 2
+
+
+def test_failure_reaches_in_flight_waiters():
+    async def scenario():
+        store = IdempotencyStore()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise RuntimeError("upstream failed")
+
+        tasks = [asyncio.create_task(store.run("key", "fp", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_expired_entries_run_again(monkeypatch):
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=10)
+        now = [1000.0]
+        monkeypatch.setattr("idempotency.time.monotonic", lambda: now[0])
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return len(calls)
+
+        first = await store.run("key", "fp", work)
+        now[0] += 11
+        second = await store.run("key", "fp", work)
+        return first, second
+
+    assert run(scenario()) == ((1, False), (2, False))
+
+
+def test_size_eviction_drops_oldest_completed_entries():
+    async def scenario():
+        store = IdempotencyStore(max_entries=2)
+
+        async def work():
+            return "done"
+
+        for key in ("a", "b", "c"):
+            await store.run(key, None, work)
+        return list(store._entries)
+
+    assert run(scenario()) == ["b", "c"]
+
+
+def test_size_eviction_never_drops_in_flight_entries():
+    async def scenario():
+        store = IdempotencyStore(max_entries=1)
+        release = asyncio.Event()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await release.wait()
+            return "slow"
+
+        async def fast():
+            return "fast"
+
+        first = asyncio.create_task(store.run("slow", None, slow))
+        await asyncio.sleep(0)
+        # Going over the cap must not forget the request still in flight
+        await store.run("other", None, fast)
+        waiter = asyncio.create_task(store.run("slow", None, slow))
+        await asyncio.sleep(0)
+        release.set()
+        return await first, await waiter, calls
+
+    first, waiter, calls = run(scenario())
+    assert first == ("slow", False)
+    assert waiter == ("slow", True)
+    assert len(calls) == 1
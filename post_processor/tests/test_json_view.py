@@ -0,0 +1,75 @@
+import json
+import os
+
+from json_view import JsonFileView
+
+
+def write(path, content):
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+    # Make sure the change is seen even within the filesystem's mtime resolution
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_changes_since_cursor(tmp_path):
+    path = tmp_path / "calls.json"
+    write(path, {"a": 1, "b": 2})
+    view = JsonFileView(str(path))
+    view.refresh()
+    cursor = view.cursor
+
+    write(path, {"a": 1, "b": 3, "c": 4})
+    view.refresh()
+    assert view.changes_since(cursor) == ({"b": 3, "c": 4}, [], False)
+
+    cursor = view.cursor
+    write(path, {"a": 1, "c": 4})
+    view.refresh()
+    assert view.changes_since(cursor) == ({}, ["b"], False)
+
+
+def test_unknown_cursor_forces_full_sync(tmp_path):
+    path = tmp_path / "calls.json"
+    write(path, {"a": 1})
+    view = JsonFileView(str(path))
+    view.refresh()
+    assert view.changes_since("stale.3") == ({"a": 1}, [], True)
+
+
+def test_invalid_file_keeps_last_good_records(tmp_path):
+    path = tmp_path / "calls.json"
+    write(path, {"a": 1, "b": 2})
+    view = JsonFileView(str(path))
+    view.refresh()
+    cursor = view.cursor
+
+    for broken in ("{bad", "", "[1, 2]"):
+        write(path, broken)
+        view.refresh()
+        assert view.status == JsonFileView.INVALID
+        assert view.records == {"a": 1, "b": 2}
+        assert view.changes_since(cursor) == ({}, [], False)
+
+    write(path, {"a": 1, "b": 2})
+    view.refresh()
+    assert view.status == JsonFileView.OK
+    assert view.changes_since(cursor) == ({}, [], False)
+
+
+def test_deleted_keys_are_capped(tmp_path):
+    path = tmp_path / "calls.json"
+    write(path, {"a": 1, "b": 2, "c": 3})
+    view = JsonFileView(str(path), max_deleted=2)
+    view.refresh()
+    start = view.cursor
+
+    for remaining in ({"b": 2, "c": 3}, {"c": 3}, {}):
+        before = view.cursor
+        write(path, remaining)
+        view.refresh()
+        assert len(view._deleted) <= 2
+
+    # Only the oldest deletion was forgotten, so newer cursors still get deltas
+    assert view.changes_since(before) == ({}, ["c"], False)
+    # A cursor from before the forgotten deletion has to resync in full
+    assert view.changes_since(start) == ({}, [], True)
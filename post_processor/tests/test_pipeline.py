@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("motor")
+
+from fastapi import HTTPException
+
+import blandai
+import pipeline
+from pipeline import PipelineCell, PopulateCellsRequest, populate_cells
+
+ENTRY_A = "65f1a2b3c4d5e6f7a8b9c0d1"
+ENTRY_B = "65f1a2b3c4d5e6f7a8b9c0d2"
+ENTRY_C = "65f1a2b3c4d5e6f7a8b9c0d3"
+ENTRY_D = "65f1a2b3c4d5e6f7a8b9c0d4"
+
+RATING = "On a scale of 1 to 10, how would you rate the hackathon?"
+ENJOYED = "What did you enjoy the most about the hackathon?"
+TRANSCRIPT = f"assistant: {RATING}\nuser: Nine.\nassistant: {ENJOYED}\nuser: The pizza.\n"
+
+
+class FakeBland:
+    """Stands in for call_bland_api, answering like Bland AI would"""
+
+    def __init__(self, statuses=None, rejected=()):
+        self.statuses = statuses or {}
+        self.rejected = set(rejected)
+        self.placed = []
+        self.analyzed = []
+
+    def __call__(self, endpoint, method="GET", data=None):
+        if endpoint == "calls" and method == "POST":
+            if data["phone_number"] in self.rejected:
+                raise HTTPException(status_code=400, detail="Invalid phone number")
+            self.placed.append(data)
+            return {"call_id": f"call-{data['phone_number']}"}
+        if endpoint.endswith("/analyze"):
+            self.analyzed.append(data)
+            return {"answers": ["The pizza"] * len(data["questions"])}
+        call_id = endpoint.split("/")[1]
+        return {"status": self.statuses.get(call_id, "completed"), "concatenated_transcript": TRANSCRIPT}
+
+
+class FakeDB:
+    def __init__(self, invalid_ids=(), missing_ids=()):
+        self.invalid_ids = list(invalid_ids)
+        self.missing_ids = list(missing_ids)
+        self.updates = None
+
+    async def bulk_update_hackathon_fields(self, updates):
+        self.updates = updates
+        return {"success": True, "invalid_ids": self.invalid_ids, "missing_ids": self.missing_ids}
+
+
+@pytest.fixture
+def bland(monkeypatch):
+    fake = FakeBland()
+    monkeypatch.setattr(blandai, "call_bland_api", fake)
+    monkeypatch.setattr(blandai, "save_call_data", lambda response, request: None)
+    return fake
+
+
+def cell(entry_id, field, phone_number, question, answer_type="string"):
+    return PipelineCell(entry_id=entry_id, field=field, phone_number=phone_number, question=question, answer_type=answer_type)
+
+
+def run_job(monkeypatch, cells):
+    async def scenario():
+        # The semaphore is created per test so it belongs to this test's event loop
+        monkeypatch.setattr(pipeline, "call_slots", asyncio.Semaphore(pipeline.PIPELINE_MAX_CONCURRENT_CALLS))
+        job = await populate_cells(PopulateCellsRequest(cells=cells, goal="Get feedback."))
+        await asyncio.gather(*pipeline._running_tasks)
+        return pipeline.pipeline_jobs[job["job_id"]]
+
+    return asyncio.run(scenario())
+
+
+def test_cells_sharing_a_number_share_one_call(monkeypatch, bland):
+    db = FakeDB()
+    monkeypatch.setattr(pipeline, "db_manager", db)
+    job = run_job(monkeypatch, [
+        cell(ENTRY_A, "rating", "+441111111111", RATING, "number"),
+        cell(ENTRY_A, "enjoyed", "+441111111111", ENJOYED),
+        cell(ENTRY_B, "rating", "+441111111111", RATING, "number"),
+    ])
+
+    assert len(bland.placed) == 1
+    # The repeated question is only asked once
+    assert bland.placed[0]["task"].count(RATING) == 1
+    assert [len(data["questions"]) for data in bland.analyzed] == [1]
+    assert db.updates == {ENTRY_A: {"rating": 9, "enjoyed": "The pizza"}, ENTRY_B: {"rating": 9}}
+    assert [c["status"] for c in job["cells"]] == ["written"] * 3
+    assert {c["call_id"] for c in job["cells"]} == {"call-+441111111111"}
+    assert [c["source"] for c in job["cells"]] == ["rule:rating", "bland", "rule:rating"]
+
+
+def test_failed_calls_fail_their_cells(monkeypatch, bland):
+    bland.statuses = {"call-+442222222222": "no-answer"}
+    bland.rejected = {"+443333333333"}
+    db = FakeDB()
+    monkeypatch.setattr(pipeline, "db_manager", db)
+    job = run_job(monkeypatch, [
+        cell(ENTRY_A, "rating", "+441111111111", RATING, "number"),
+        cell(ENTRY_B, "rating", "+442222222222", RATING, "number"),
+        cell(ENTRY_C, "rating", "+443333333333", RATING, "number"),
+    ])
+
+    written, no_answer, rejected = job["cells"]
+    assert written["status"] == "written"
+    assert no_answer["status"] == "failed"
+    assert no_answer["error"] == "Call ended with status no-answer"
+    assert rejected["status"] == "failed"
+    assert rejected["error"] == "Call failed: Invalid phone number"
+    # Only answered cells are written back
+    assert db.updates == {ENTRY_A: {"rating": 9}}
+    assert job["status"] == "completed"
+
+
+def test_write_back_reports_invalid_and_missing_entries(monkeypatch, bland):
+    db = FakeDB(invalid_ids=[ENTRY_B], missing_ids=[ENTRY_C])
+    monkeypatch.setattr(pipeline, "db_manager", db)
+    job = run_job(monkeypatch, [
+        cell(ENTRY_A, "rating", "+441111111111", RATING, "number"),
+        cell(ENTRY_B, "rating", "+442222222222", RATING, "number"),
+        cell(ENTRY_C, "rating", "+443333333333", RATING, "number"),
+        cell(ENTRY_D, "rating", "+444444444444", RATING, "number"),
+    ])
+
+    assert [(c["status"], c["error"]) for c in job["cells"]] == [
+        ("written", None),
+        ("failed", "Invalid ID format"),
+        ("failed", "Entry not found"),
+        ("written", None),
+    ]
+
+
+@pytest.mark.parametrize("cells, detail", [
+    ([], "At least one cell must be provided"),
+    ([cell("not-an-id", "rating", "+441111111111", RATING)], "Invalid ID format: not-an-id"),
+    ([cell(ENTRY_A, "data.rating", "+441111111111", RATING)], "Invalid field name: data.rating"),
+    (
+        [cell(ENTRY_A, "rating", "+441111111111", RATING), cell(ENTRY_A, "rating", "+442222222222", ENJOYED)],
+        f"Duplicate cell: {ENTRY_A} rating",
+    ),
+])
+def test_populate_rejects_bad_cells_before_dialing(bland, cells, detail):
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(populate_cells(PopulateCellsRequest(cells=cells, goal="Get feedback.")))
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == detail
+    assert bland.placed == []
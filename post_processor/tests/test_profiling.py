@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import profiling
+from profiling import finish_profile, profile_span, start_profile
+
+
+def busy(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def blocking_call(seconds):
+    with profile_span("bland.GET"):
+        time.sleep(seconds)
+
+
+def test_cpu_work_is_reported_next_to_concurrent_spans():
+    async def scenario():
+        profile, token = start_profile("GET", "/bland/calls", "requested")
+        await asyncio.gather(asyncio.to_thread(blocking_call, 0.03), asyncio.to_thread(blocking_call, 0.03))
+        busy(0.01)
+        finish_profile(profile, token, 200)
+        return profile
+
+    profile = asyncio.run(scenario())
+    breakdown = profile.summary()["breakdown_ms"]
+    # Concurrent spans each keep their own time
+    assert breakdown["bland"] >= 60
+    assert breakdown["cpu"] >= 9
+    # cpu and other share the wall time not covered by any span, counting overlaps once
+    covered = profile._covered_seconds() * 1000
+    assert 30 <= covered < 50
+    assert abs(breakdown["cpu"] + breakdown["other"] + covered - profile.wall_seconds * 1000) < 1
+
+
+def test_cpu_inside_spans_is_not_counted_as_cpu():
+    async def scenario():
+        profile, token = start_profile("GET", "/hackathon/", "requested")
+        with profile_span("serialize"):
+            busy(0.02)
+        finish_profile(profile, token, 200)
+        return profile
+
+    breakdown = asyncio.run(scenario()).summary()["breakdown_ms"]
+    assert breakdown["serialize"] >= 20
+    assert breakdown.get("cpu", 0) < 5
+
+
+def test_spans_after_finish_are_ignored():
+    async def scenario():
+        profile, token = start_profile("POST", "/pipeline/populate", "requested")
+        finish_profile(profile, token, 202)
+        # A background task still carrying the request's context
+        profiling._current.set((profile, ()))
+        with profile_span("bland.GET"):
+            pass
+        return profile
+
+    profile = asyncio.run(scenario())
+    assert "bland" not in profile.summary()["breakdown_ms"]
+
+
+def test_profiling_token_check(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    assert profiling.is_profiling_token("secret")
+    assert not profiling.is_profiling_token("secreT")
+    assert not profiling.is_profiling_token(None)
+    assert not profiling.is_profiling_token("sécret")
+    assert profiling.should_profile("secret") == "requested"
+
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", None)
+    assert not profiling.is_profiling_token("secret")
@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def hold(limiter, client_id, release, admitted):
+    async with limiter.acquire(client_id):
+        admitted.append(client_id)
+        await release.wait()
+
+
+def test_limiter_bounds_queue_for_simultaneous_burst():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, per_client=10)
+        release = asyncio.Event()
+        admitted = []
+        # All arrive in the same loop tick, before any of them holds the semaphore
+        tasks = [asyncio.create_task(hold(limiter, f"client-{i}", release, admitted)) for i in range(6)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return admitted, results
+
+    admitted, results = run(scenario())
+    rejected = [result for result in results if isinstance(result, Overloaded)]
+    assert len(admitted) == 2
+    assert len(rejected) == 4
+
+
+def test_limiter_rejects_client_over_its_cap():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=5, max_queue=5, per_client=1)
+        release = asyncio.Event()
+        admitted = []
+        first = asyncio.create_task(hold(limiter, "client", release, admitted))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with limiter.acquire("client"):
+                pass
+        # Other clients are unaffected
+        async with limiter.acquire("other"):
+            pass
+        release.set()
+        await first
+        return admitted
+
+    assert run(scenario()) == ["client"]
+
+
+def test_limiter_times_out_queued_requests():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, per_client=10, queue_timeout=0.01)
+        release = asyncio.Event()
+        admitted = []
+        first = asyncio.create_task(hold(limiter, "a", release, admitted))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with limiter.acquire("b"):
+                pass
+        release.set()
+        await first
+        # Slots and queue places are given back afterwards
+        async with limiter.acquire("b"):
+            admitted.append("b")
+        return admitted
+
+    assert run(scenario()) == ["a", "b"]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("resilience.time.monotonic", clock)
+    return clock
+
+
+def fail():
+    raise RuntimeError("upstream failed")
+
+
+def succeed():
+    return "ok"
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+
+
+def test_breaker_opens_on_threshold(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=3, recovery_timeout=30)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(succeed)
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=2)
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    breaker.call(succeed)
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_ignores_errors_that_are_not_failures(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=1, is_failure=lambda e: not isinstance(e, ValueError))
+
+    def bad_request():
+        raise ValueError("caller's fault")
+
+    with pytest.raises(ValueError):
+        breaker.call(bad_request)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_admits_single_probe(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=1, recovery_timeout=30)
+    open_breaker(breaker)
+    clock.now += 31
+
+    refused = []
+
+    def probe():
+        # A second call while the probe is running fails fast
+        with pytest.raises(CircuitOpenError):
+            breaker.call(succeed)
+        refused.append(True)
+        return "ok"
+
+    assert breaker.call(probe) == "ok"
+    assert refused == [True]
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=1, recovery_timeout=30)
+    open_breaker(breaker)
+    clock.now += 31
+
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(succeed)
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=1, slow_call_seconds=5)
+
+    def slow():
+        clock.now += 6
+        return "ok"
+
+    assert breaker.call(slow) == "ok"
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stale_result_after_generation_change_is_ignored(clock):
+    breaker = CircuitBreaker("upstream", failure_threshold=1, recovery_timeout=30)
+
+    def slow_success():
+        # While this call is in flight another one fails and opens the breaker
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+        return "ok"
+
+    assert breaker.call(slow_success) == "ok"
+    # The late success was admitted while closed, so it must not close the open breaker
+    assert breaker.state == CircuitBreaker.OPEN
+
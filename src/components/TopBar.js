@@ -3,6 +3,12 @@ import { Button, Navbar, Dropdown, Spinner, Toast } from 'flowbite-react';
 import { FaPhone, FaTable } from 'react-icons/fa';
 import { FaClockRotateLeft, FaCheck, FaTriangleExclamation } from "react-icons/fa6";
 
+// Idempotency keys for calls that have not been confirmed yet, by number and task.
+// Re-clicking after a timeout reuses the key, so the server replays the call it
+// may already have placed instead of ringing the number again. The key is dropped
+// once the server answers, so a later deliberate call gets a fresh one.
+const pendingCallKeys = new Map();
+
 const TopBar = ({ onPopulate, onShowHistory, contextText, spreadsheetRef }) => {
   const [isLoading, setIsLoading] = useState(false);
   const [callStatus, setCallStatus] = useState({ success: 0, failed: 0, total: 0 });
@@ -33,18 +39,27 @@ const TopBar = ({ onPopulate, onShowHistory, contextText, spreadsheetRef }) => {
       
       console.log(`Making call to formatted number: ${formattedNumber} (original: ${phoneNumber})`);
       
+      const task = contextText || "You are a friendly assistant calling to introduce yourself. Be polite and ask how their day is going. Keep the conversation brief and friendly.";
+      const callKey = `${formattedNumber}|${task}`;
+      if (!pendingCallKeys.has(callKey)) {
+        pendingCallKeys.set(callKey, crypto.randomUUID());
+      }
+
       const response = await fetch('https://e979-158-41-64-74.ngrok-free.app/bland/calls', {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          'Idempotency-Key': pendingCallKeys.get(callKey)
         },
         body: JSON.stringify({
           "phone_number": formattedNumber,
-          "task": contextText || "You are a friendly assistant calling to introduce yourself. Be polite and ask how their day is going. Keep the conversation brief and friendly.",
+          "task": task,
           "voice": "Josh",
           "wait_for_greeting": true
         })
       });
+      // Any answer from the server settles the call; only lost responses keep the key
+      pendingCallKeys.delete(callKey);
       
       if (!response.ok) {
         throw new Error(`Error: ${response.status}`);